@@ -1,95 +1,146 @@
+import argparse
 import datetime
-from utils.analysis import interp_data, use_sigma_criteria, bandpass_filter, apf
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from gnss import TIME_FORMAT, parse_time_labels
+from utils.analysis import interp_data, use_sigma_criteria, bandpass_filter
 from utils.geo.geo_coords import GeoCoord
 
+FLAGS = ('Lat', 'Lon')
+
 
-def load_parse_data(load_file: str, time_format: str, time_sep = '\t'):
-    time_list = []
-    coord_list = []
-    dtec_list = []
-    with open(load_file, 'r') as file:
-        for line in file:
-            str_data = line.split(time_sep)
-            time_str = str_data[0]
-            current_time = datetime.datetime.strptime(time_str, time_format)
-            time_list.append(current_time)
-            coord_list.append(float(str_data[1]))
-            dtec_list.append(float(str_data[2]))
-    return time_list, coord_list, dtec_list
+def load_time_coord_data(load_file: str, time_sep=b'\t'):
+    with open(load_file, 'rb') as file:
+        rows = [line.split(time_sep)[:3] for line in file if line.strip()]
+    if not rows:
+        return np.empty(0, dtype='datetime64[s]'), np.empty(0), np.empty((0, 0))
+    time_labels, coord_labels, dtec_labels = zip(*rows)
+    time_labels, time_inv = np.unique(np.array(time_labels), return_inverse=True)
+    times = parse_time_labels(time_labels).astype('datetime64[s]')
+    coords, coord_inv = np.unique(np.array(coord_labels, dtype=float), return_inverse=True)
+    dtec = np.full((len(times), len(coords)), np.nan)
+    dtec[time_inv.ravel(), coord_inv.ravel()] = np.array(dtec_labels, dtype=float)
+    return times, coords, dtec
 
 
-def add_time_coord_to_file(file_name, time_format, time, coords, dTEC):
+def save_time_coord_data(file_name, times, coords, dtec, time_format=TIME_FORMAT):
+    time_labels = [time.strftime(time_format) for time in np.asarray(times, dtype='datetime64[s]').tolist()]
+    coord_labels = list(map(str, np.asarray(coords, dtype=float).tolist()))
+    dtec_values = np.asarray(dtec, dtype=float).reshape(len(time_labels), len(coord_labels)).tolist()
     with open(file_name, 'w') as file:
-        for num in range(len(time)):
-            for coord in coords:
-                str_time = datetime.datetime.strftime(time[num], time_format)
-                c_dTEC = dTEC[coord][num]
-                file.write(f"{str_time}\t{coord}\t{c_dTEC}\n")
+        file.write(''.join(f"{time_label}\t{coord_label}\t{value}\n"
+                           for time_label, row in zip(time_labels, dtec_values)
+                           for coord_label, value in zip(coord_labels, row)))
 
 
-if __name__ == '__main__':
-    year = 2017
-    month = 7
-    day = 17
-    month_str = str(month).zfill(2)
-    day_str = str(day).zfill(2)
-    date_str = f"{year}-{month_str}-{day_str}"
-    c_lat = GeoCoord(55, 0)
-    c_lon = GeoCoord(10, 0)
-    resol_lat = GeoCoord(0, 45)
-    resol_lon = GeoCoord(0, 45)
-    min_period = 30
-    max_period = 120
-    time_format = '%Y.%m.%d %H:%M:%S'
-    flag = 'Lon'
-    if flag == 'Lat':
-        read_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/{flag}/1/{c_lat.degs}d{c_lat.mins}m_{resol_lat.degs}d{resol_lat.mins}m_lat_av.txt"
-        corr_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/{flag}/2/{c_lat.degs}d{c_lat.mins}m_{resol_lat.degs}d{resol_lat.mins}m_lat_corr.txt"
-        filter_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/{flag}/3/{c_lat.degs}d{c_lat.mins}m_{resol_lat.degs}d{resol_lat.mins}m_lat_filter.txt"
-        out_file_name = f"{date_str}_{c_lat.degs}d{c_lat.mins}m_{resol_lat.degs}d{resol_lat.mins}m_lat_filter.txt"
-
-    if flag == 'Lon':
-        read_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/{flag}/1/{c_lon.degs}d{c_lon.mins}m_{resol_lon.degs}d{resol_lon.mins}m_lon_av.txt"
-        corr_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/{flag}/2/{c_lon.degs}d{c_lon.mins}m_{resol_lon.degs}d{resol_lon.mins}m_lon_corr.txt"
-        filter_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/{flag}/3/{c_lon.degs}d{c_lon.mins}m_{resol_lon.degs}d{resol_lon.mins}m_lon_filter.txt"
-        out_file_name = f'{date_str}_{c_lon.degs}d{c_lon.mins}m_{resol_lon.degs}d{resol_lon.mins}m_lon_params.txt'
-    res = load_parse_data(read_file_name, time_format)
-    coords = sorted(list(set(res[1])))
-    print(coords)
-    signal = dict()
-    for coord in coords:
-        time = []
-        dTEC = []
-        for j in range(len(res[0])):
-            if res[1][j] == coord:
-                time.append(res[0][j])
-                dTEC.append(res[2][j])
-        signal[coord] = (time, dTEC)
-    time_start = datetime.datetime(year, month, day, 0, 0, 0)
-    time_end = datetime.datetime(year, month, day, 23, 59, 30)
-    time_delta = datetime.timedelta(seconds=30)
-    n_time = int((time_end - time_start) / time_delta) + 1
-    coord_time_interp = [time_start + j * time_delta for j in range(n_time)]
-    coord_float_time_interp = [x.hour + x.minute / 60. + x.second / 3600 for x in coord_time_interp]
-    coord_dTEC_corr = dict()
-    coord_dTEC_filter = dict()
-    n_time = len(coord_float_time_interp)
+def create_file_names(out_path: str, date: datetime.date, window: int, flag: str,
+                      center: GeoCoord, resol: GeoCoord) -> tuple[str, str, str]:
+    date_dir = date.strftime('%Y-%m-%d')
+    day_dir = f"{out_path}/{date.year}/{date_dir}/{window}/{flag}"
+    stem = f"{center.degs}d{center.mins}m_{resol.degs}d{resol.mins}m_{flag.lower()}"
+    read_file_name = f"{day_dir}/1/{stem}_av.txt"
+    corr_file_name = f"{day_dir}/2/{stem}_corr.txt"
+    filter_file_name = f"{day_dir}/3/{stem}_filter.txt"
+    return read_file_name, corr_file_name, filter_file_name
+
+
+def filter_day_file(read_file_name, corr_file_name, filter_file_name, date: datetime.date,
+                    min_period, max_period, sigma_window=120):
+    times, coords, dtec = load_time_coord_data(read_file_name)
+    time_start = np.datetime64(date, 's')
+    time_interp = time_start + np.arange(0, 86400, 30).astype('timedelta64[s]')
+    dtec_corr = np.empty((len(time_interp), len(coords)))
     for num in range(len(coords)):
-        print(num)
-        coord_time = signal[coords[num]][0]
-        coord_dTEC = signal[coords[num]][1]
-        if coord_time_interp[0] not in coord_time:
-            coord_time.insert(0, coord_time_interp[0])
-            coord_dTEC.insert(0, 0)
-        if coord_time_interp[-1] not in coord_time:
-            coord_time.append(coord_time_interp[-1])
-            coord_dTEC.append(0)
-        coord_dTEC_interp = interp_data(coord_time, coord_dTEC, coord_time_interp, k=1)
-        coord_dTEC_corr[coords[num]] = use_sigma_criteria(coord_dTEC_interp, window=120)
-        coord_dTEC_filter[coords[num]] = bandpass_filter(coord_dTEC_corr[coords[num]], 2 * min_period, 2 * max_period)
-    add_time_coord_to_file(corr_file_name, time_format, coord_time_interp, coords, coord_dTEC_corr)
-    add_time_coord_to_file(filter_file_name, time_format, coord_time_interp, coords, coord_dTEC_filter)
+        valid = ~np.isnan(dtec[:, num])
+        coord_time = times[valid]
+        coord_dTEC = dtec[valid, num]
+        if time_interp[0] not in coord_time:
+            coord_time = np.insert(coord_time, 0, time_interp[0])
+            coord_dTEC = np.insert(coord_dTEC, 0, 0)
+        if time_interp[-1] not in coord_time:
+            coord_time = np.append(coord_time, time_interp[-1])
+            coord_dTEC = np.append(coord_dTEC, 0)
+        coord_dTEC_interp = interp_data(coord_time, coord_dTEC, time_interp, k=1)
+        dtec_corr[:, num] = use_sigma_criteria(coord_dTEC_interp, window=sigma_window)
+    dtec_filter = dtec_corr
+    if len(coords):
+        dtec_filter = bandpass_filter(dtec_corr.T, 2 * min_period, 2 * max_period).T
+    os.makedirs(os.path.dirname(corr_file_name), exist_ok=True)
+    os.makedirs(os.path.dirname(filter_file_name), exist_ok=True)
+    save_time_coord_data(corr_file_name, time_interp, coords, dtec_corr)
+    save_time_coord_data(filter_file_name, time_interp, coords, dtec_filter)
+    return len(coords)
+
 
+def filter_job(out_path, date, window, flag, center, resol, min_period, max_period):
+    read_file_name, corr_file_name, filter_file_name = create_file_names(out_path, date, window, flag,
+                                                                         center, resol)
+    if not os.path.isfile(read_file_name):
+        logging.warning(f"File {read_file_name} was not found.")
+        return 0
+    return filter_day_file(read_file_name, corr_file_name, filter_file_name, date, min_period, max_period)
 
 
+def run_batch(out_path, start_date: datetime.date, end_date: datetime.date, flags, window,
+              centers: dict, resols: dict, min_period, max_period, workers=1):
+    n_days = (end_date - start_date).days + 1
+    jobs = [(start_date + datetime.timedelta(days=day), flag) for day in range(n_days) for flag in flags]
+    dates, job_flags = zip(*jobs) if jobs else ((), ())
+    job_args = (repeat(out_path), dates, repeat(window), job_flags,
+                [centers[flag] for flag in job_flags], [resols[flag] for flag in job_flags],
+                repeat(min_period), repeat(max_period))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results_gen = executor.map(filter_job, *job_args)
+            for job_num, coord_count in enumerate(results_gen):
+                logging.info('%s %s: %d bins (%d of %d)', dates[job_num], job_flags[job_num], coord_count,
+                             job_num + 1, len(jobs))
+    else:
+        for job_num, args in enumerate(zip(*job_args)):
+            coord_count = filter_job(*args)
+            logging.info('%s %s: %d bins (%d of %d)', dates[job_num], job_flags[job_num], coord_count,
+                         job_num + 1, len(jobs))
 
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    parser = argparse.ArgumentParser(
+        description="Remove outliers and bandpass filter averaged Lat/Lon dTEC series.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("start_date", help="First date in format YYYY-MM-DD.", type=str)
+    parser.add_argument("end_date", help="Last date in format YYYY-MM-DD (start_date by default).",
+                        nargs='?', default=None, type=str)
+    parser.add_argument("-o", "--out_path", help="Path to the averaged files in format path/to/the/files.",
+                        default="results/out/EU", type=str)
+    parser.add_argument("-w", "--window", help="Window length (in seconds) used for dTEC estimation.",
+                        default=7200, type=int)
+    parser.add_argument("-f", "--flags", help="Kinds of averaged files to process (Lat, Lon).",
+                        default=list(FLAGS), nargs='+', choices=FLAGS, type=str)
+    parser.add_argument("--lat", help="Center latitude of Lat files (degrees and minutes).",
+                        default=[55, 0], nargs=2, type=int)
+    parser.add_argument("--lon", help="Center longitude of Lon files (degrees and minutes).",
+                        default=[10, 0], nargs=2, type=int)
+    parser.add_argument("--lat_resol", help="Latitude resolution (degrees and minutes).",
+                        default=[0, 45], nargs=2, type=int)
+    parser.add_argument("--lon_resol", help="Longitude resolution (degrees and minutes).",
+                        default=[0, 45], nargs=2, type=int)
+    parser.add_argument("--min_period", help="Minimal period (in minutes) of the bandpass filter.",
+                        default=30, type=int)
+    parser.add_argument("--max_period", help="Maximal period (in minutes) of the bandpass filter.",
+                        default=120, type=int)
+    parser.add_argument("-n", "--workers", help="Number of worker processes.",
+                        default=1, type=int)
+    args = parser.parse_args()
+    start = datetime.datetime.strptime(args.start_date, '%Y-%m-%d').date()
+    end = datetime.datetime.strptime(args.end_date, '%Y-%m-%d').date() if args.end_date else start
+    run_batch(out_path=args.out_path, start_date=start, end_date=end, flags=args.flags, window=args.window,
+              centers={'Lat': GeoCoord(*args.lat), 'Lon': GeoCoord(*args.lon)},
+              resols={'Lat': GeoCoord(*args.lat_resol), 'Lon': GeoCoord(*args.lon_resol)},
+              min_period=args.min_period, max_period=args.max_period, workers=args.workers)
@@ -1,7 +1,7 @@
 from PyQt5.QtGui import QGuiApplication
 from PyQt5.QtWidgets import QMainWindow, QFileDialog
 
-from gnss import GnssArchive, GnssData, convert_to_hours, TIME_FORMAT
+from gnss import GnssArchive, GnssData, convert_to_hours, find_parsed_file, parse_time_labels, parse_time_values
 from ui.cartopy_figure import GeoAxesMap, DEFAULT_MAP_PARAMS, DEFAULT_GRID_PARAMS, PROJECTIONS
 from utils.geo.geo_coords import GeoCoord
 from ui.main_window1 import Ui_MainWindow
@@ -236,10 +236,11 @@ class DTECViewerForm(QMainWindow, Ui_MainWindow):
     def read_data(self):
         if self.gnss_archive is None:
             raise FileNotFoundError("GNSS archive is not opened.")
-        if not self.gnss_data.data:
-            file_name = f"{self.gnss_archive.get_parsed_file_stem(self.in_dir, self.filter_sec)}.txt"
-            if not os.path.isfile(file_name):
-                raise FileNotFoundError(f"Parsed file f'{file_name}' is not exist.")
+        if not len(self.gnss_data.data):
+            file_stem = self.gnss_archive.get_parsed_file_stem(self.in_dir, self.filter_sec)
+            file_name = find_parsed_file(file_stem)
+            if file_name is None:
+                raise FileNotFoundError(f"Parsed file f'{file_stem}' is not exist.")
             self.gnss_data.read_gnss_data(file_name)
 
     def plot_time_stamp_data(self):
@@ -345,7 +346,7 @@ class DTECViewerForm(QMainWindow, Ui_MainWindow):
             with open(coord_file_name, mode='r') as res_file:
                 raw_data = [line.split('\t') for line in res_file]
                 data = list(zip(*raw_data))
-                time_value = [dt.datetime.strptime(x, TIME_FORMAT) for x in data[0]]
+                time_value = parse_time_values(data[0])
                 dtec_value = list(map(float, data[1]))
         else:
             current_date = self.dt_data_time_start.dateTime().toPyDateTime().date()
@@ -408,8 +409,8 @@ class DTECViewerForm(QMainWindow, Ui_MainWindow):
         if os.path.isfile(lat_file_name):
             with open(lat_file_name, mode='r') as res_file:
                 raw_data = [line.split('\t') for line in res_file]
-                for data in raw_data:
-                    time_value = convert_to_hours(dt.datetime.strptime(data[0], TIME_FORMAT))
+                time_hours = (parse_time_labels([data[0] for data in raw_data]) % 86400 / 3600.).tolist()
+                for time_value, data in zip(time_hours, raw_data):
                     lat_value = float(data[1])
                     dtec_value = float(data[2])
                     c = self.keo_lat_color_bar.cmap(norm(dtec_value))
@@ -480,8 +481,8 @@ class DTECViewerForm(QMainWindow, Ui_MainWindow):
         if os.path.isfile(lon_file_name):
             with open(lon_file_name, mode='r') as res_file:
                 raw_data = [line.split('\t') for line in res_file]
-                for data in raw_data:
-                    time_value = convert_to_hours(dt.datetime.strptime(data[0], TIME_FORMAT))
+                time_hours = (parse_time_labels([data[0] for data in raw_data]) % 86400 / 3600.).tolist()
+                for time_value, data in zip(time_hours, raw_data):
                     lon_value = float(data[1])
                     dtec_value = float(data[2])
                     c = self.keo_lon_color_bar.cmap(norm(dtec_value))
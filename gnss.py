@@ -1,10 +1,24 @@
-from zipfile import Path
+from zipfile import ZipFile
 from sys import argv
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import io
 import os
 import datetime as dt
+import numpy as np
 
 
 TIME_FORMAT = '%Y.%m.%d %H:%M:%S'
+PARSED_TITLE = ('hour', 'min', 'sec', 'dTEC', 'azm', 'elm', 'gdlat', 'gdlon')
+PARSED_DTYPE = np.dtype([('hour', np.uint8), ('min', np.uint8), ('sec', np.uint8),
+                         ('dTEC', np.float64), ('azm', np.float64), ('elm', np.float64),
+                         ('gdlat', np.float64), ('gdlon', np.float64)])
+PARSED_FORMATS = {'bin': '.bin', 'txt': '.txt'}
+INDEX_SUFFIX = '.idx.npz'
+INDEX_CELL_SIZE = 1.0
+PRN_FILES = tuple(f"G{str(j).zfill(2)}.txt" for j in range(1, 33))
+JOURNAL_SUFFIX = '.jnl'
+TIME_LABEL_WIDTH = 19
+TIME_LABEL_FIELDS = ((0, 4), (5, 7), (8, 10), (11, 13), (14, 16), (17, 19))
 
 
 def convert_to_hours(tt: dt.datetime) -> float:
@@ -15,6 +29,214 @@ def convert_to_seconds(tt: dt.datetime) -> int:
     return tt.hour * 3600 + tt.minute * 60 + tt.second
 
 
+def parse_time_labels(labels) -> np.ndarray:
+    labels = np.asarray(labels, dtype=f'S{TIME_LABEL_WIDTH}')
+    digits = labels.view(np.uint8).reshape(-1, TIME_LABEL_WIDTH).astype(np.int64) - ord('0')
+    fields = []
+    for start, stop in TIME_LABEL_FIELDS:
+        value = np.zeros(len(digits), dtype=np.int64)
+        for col in range(start, stop):
+            value = value * 10 + digits[:, col]
+        fields.append(value)
+    year, month, day, hour, minute, second = fields
+    months = (year - 1970) * 12 + month - 1
+    days = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + day - 1
+    return days * 86400 + hour * 3600 + minute * 60 + second
+
+
+def parse_time_values(labels) -> list:
+    return parse_time_labels(labels).astype('datetime64[s]').tolist()
+
+
+def create_parsed_records(columns: dict) -> np.ndarray:
+    records = np.empty(len(columns['dTEC']), dtype=PARSED_DTYPE)
+    for name in PARSED_TITLE:
+        records[name] = columns[name]
+    return records
+
+
+def find_parsed_file(file_stem: str) -> str | None:
+    for ext in PARSED_FORMATS.values():
+        if os.path.isfile(f"{file_stem}{ext}"):
+            return f"{file_stem}{ext}"
+    return None
+
+
+def read_parsed_data(file_name: str) -> np.ndarray:
+    if file_name.endswith(PARSED_FORMATS['bin']):
+        if os.path.getsize(file_name) == 0:
+            return np.empty(0, dtype=PARSED_DTYPE)
+        return np.memmap(file_name, dtype=PARSED_DTYPE, mode='r')
+    sidecar_name = f"{file_name}{PARSED_FORMATS['bin']}"
+    if os.path.isfile(sidecar_name) and os.path.getmtime(sidecar_name) >= os.path.getmtime(file_name):
+        return read_parsed_data(sidecar_name)
+    values = np.loadtxt(file_name, usecols=range(len(PARSED_TITLE)), ndmin=2)
+    records = create_parsed_records(dict(zip(PARSED_TITLE, values.T)))
+    records.tofile(f"{sidecar_name}.tmp")
+    os.replace(f"{sidecar_name}.tmp", sidecar_name)
+    return records
+
+
+def get_day_seconds(records: np.ndarray) -> np.ndarray:
+    return (records['hour'].astype(np.int64) * 3600 + records['min'].astype(np.int64) * 60 +
+            records['sec'].astype(np.int64))
+
+
+class GnssIndex:
+    def __init__(self, arrays: dict):
+        self.n_rows = int(arrays['n_rows'])
+        self.cell_size = float(arrays['cell_size'])
+        self.origin = arrays['origin']
+        self.shape = arrays['shape']
+        self.time_order = arrays['time_order']
+        self.time_sorted = arrays['time_sorted']
+        self.cell_order = arrays['cell_order']
+        self.cell_starts = arrays['cell_starts']
+
+    @classmethod
+    def build(cls, records: np.ndarray, cell_size=INDEX_CELL_SIZE):
+        day_seconds = get_day_seconds(records)
+        time_order = np.argsort(day_seconds, kind='stable')
+        if len(records):
+            origin = np.floor([np.nanmin(records['gdlat']), np.nanmin(records['gdlon'])])
+            top = np.floor([np.nanmax(records['gdlat']), np.nanmax(records['gdlon'])])
+            shape = ((top - origin) // cell_size + 1).astype(np.int64)
+        else:
+            origin = np.zeros(2)
+            shape = np.ones(2, dtype=np.int64)
+        arrays = {'n_rows': len(records), 'cell_size': cell_size, 'origin': origin, 'shape': shape,
+                  'time_order': time_order, 'time_sorted': day_seconds[time_order],
+                  'cell_order': None, 'cell_starts': None}
+        index = cls(arrays)
+        cell_ids = (index.get_cells(records['gdlat'], 0) * shape[1] +
+                    index.get_cells(records['gdlon'], 1))
+        index.cell_order = np.argsort(cell_ids, kind='stable')
+        index.cell_starts = np.searchsorted(cell_ids[index.cell_order], np.arange(shape[0] * shape[1] + 1))
+        return index
+
+    @classmethod
+    def load_or_build(cls, file_name: str, records: np.ndarray):
+        index_name = f"{file_name}{INDEX_SUFFIX}"
+        if os.path.isfile(index_name) and os.path.getmtime(index_name) >= os.path.getmtime(file_name):
+            with np.load(index_name) as arrays:
+                index = cls(dict(arrays))
+            if index.n_rows == len(records):
+                return index
+        index = cls.build(records)
+        index.save(index_name)
+        return index
+
+    def save(self, index_name: str):
+        with open(f"{index_name}.tmp", mode='wb') as index_file:
+            np.savez(index_file, n_rows=self.n_rows, cell_size=self.cell_size, origin=self.origin,
+                     shape=self.shape, time_order=self.time_order, time_sorted=self.time_sorted,
+                     cell_order=self.cell_order, cell_starts=self.cell_starts)
+        os.replace(f"{index_name}.tmp", index_name)
+
+    def get_cells(self, values, axis: int) -> np.ndarray:
+        cells = np.floor((np.asarray(values) - self.origin[axis]) / self.cell_size)
+        return np.clip(np.nan_to_num(cells), 0, self.shape[axis] - 1).astype(np.int64)
+
+    def get_time_rows(self, min_seconds, max_seconds) -> np.ndarray:
+        start = np.searchsorted(self.time_sorted, min_seconds, side='left')
+        stop = np.searchsorted(self.time_sorted, max_seconds, side='right')
+        return np.sort(self.time_order[start:stop])
+
+    def get_box_rows(self, lat_range=None, lon_range=None) -> np.ndarray:
+        lat_cells = self.get_cells(lat_range, 0) if lat_range else (0, self.shape[0] - 1)
+        lon_cells = self.get_cells(lon_range, 1) if lon_range else (0, self.shape[1] - 1)
+        parts = []
+        for lat_cell in range(lat_cells[0], lat_cells[1] + 1):
+            first_cell = lat_cell * self.shape[1] + lon_cells[0]
+            last_cell = lat_cell * self.shape[1] + lon_cells[1]
+            parts.append(self.cell_order[self.cell_starts[first_cell]:self.cell_starts[last_cell + 1]])
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+
+def get_member_prn(member_name: str) -> str:
+    return member_name.split('/')[-1].split('.')[0]
+
+
+def read_receiver_data(archive: ZipFile, rec_dir: str, member_infos: list, min_elm=30, out_format='txt'):
+    blocks = []
+    for member_info in member_infos:
+        prn = get_member_prn(member_info.filename)
+        with io.TextIOWrapper(archive.open(member_info)) as txt:
+            gnss_data_title = txt.readline().split()
+            lines_raw = txt.readlines()
+        if not lines_raw:
+            blocks.append((prn, b''))
+            continue
+        if out_format == 'bin':
+            values = np.loadtxt(lines_raw, usecols=[gnss_data_title.index(name) for name in PARSED_TITLE], ndmin=2)
+            values = values[values[:, PARSED_TITLE.index('elm')] > min_elm]
+            blocks.append((prn, create_parsed_records(dict(zip(PARSED_TITLE, values.T))).tobytes()))
+        else:
+            elm_mask = np.loadtxt(lines_raw, usecols=gnss_data_title.index('elm'), ndmin=1) > min_elm
+            blocks.append((prn, ''.join([lines_raw[i] for i in np.flatnonzero(elm_mask)]).encode()))
+    return rec_dir, blocks
+
+
+_worker_archive = None
+
+
+def open_worker_archive(archive_name: str):
+    global _worker_archive
+    _worker_archive = ZipFile(archive_name)
+
+
+def read_worker_receiver_data(rec_dir: str, member_infos: list, min_elm=30, out_format='txt'):
+    return read_receiver_data(_worker_archive, rec_dir, member_infos, min_elm, out_format)
+
+
+class GnssJournal:
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.units = set()
+        self.end = 0
+        self.__recover()
+
+    def __recover(self):
+        if not os.path.isfile(self.file_name):
+            return
+        valid_size = 0
+        with open(self.file_name, mode='rb') as journal_file:
+            for line in journal_file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    receiver, prn, _, end = line.decode().split('\t')
+                    end = int(end)
+                except ValueError:
+                    break
+                self.units.add((receiver, prn))
+                self.end = max(self.end, end)
+                valid_size += len(line)
+        os.truncate(self.file_name, valid_size)
+
+    def is_done(self, receiver: str, prn: str) -> bool:
+        return (receiver, prn) in self.units
+
+    def rollback(self, out_file_name: str):
+        if not os.path.isfile(out_file_name) or os.path.getsize(out_file_name) < self.end:
+            self.units.clear()
+            self.end = 0
+            with open(self.file_name, mode='wb'):
+                pass
+        with open(out_file_name, mode='ab') as out_file:
+            out_file.truncate(self.end)
+
+    def commit(self, units: list):
+        with open(self.file_name, mode='ab') as journal_file:
+            journal_file.write(''.join(f"{receiver}\t{prn}\t{start}\t{end}\n"
+                                       for receiver, prn, start, end in units).encode())
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        for receiver, prn, _, end in units:
+            self.units.add((receiver, prn))
+            self.end = max(self.end, end)
+
+
 class GnssArchive:
     def __init__(self, archive_name: str):
         self.filter_dirs = {3600: 'Window_3600_Seconds',
@@ -24,6 +246,30 @@ class GnssArchive:
         self.day_number = self.__get_day_number()
         self.year = self.get_year()
         self.date = self.__get_date()
+        self.receivers = []
+        self.receiver_members = {filter_dir: {} for filter_dir in self.filter_dirs.values()}
+        self.sites_info = None
+        self.__build_index()
+
+    def __build_index(self):
+        with ZipFile(self.archive_name) as archive:
+            infos = archive.infolist()
+        receivers = set()
+        for info in infos:
+            parts = info.filename.split('/')
+            if parts[0] != self.root_dir:
+                continue
+            if len(parts) < 3:
+                if info.filename == f"{self.root_dir}/Sites.txt":
+                    self.sites_info = info
+                continue
+            receivers.add(parts[1])
+            if len(parts) == 4 and parts[2] in self.receiver_members and parts[3] in PRN_FILES:
+                self.receiver_members[parts[2]].setdefault(parts[1], []).append(info)
+        self.receivers = sorted(receivers)
+        for members in self.receiver_members.values():
+            for member_infos in members.values():
+                member_infos.sort(key=lambda x: x.filename)
 
     def __get_root_dir(self):
         return self.archive_name.split('/')[-1].split('.')[0]
@@ -57,19 +303,14 @@ class GnssArchive:
         return filter_dir
 
     def get_receiver_list(self):
-        rec_paths = Path(self.archive_name, f'{self.root_dir}/')
-        rec_dirs = [rec_dir.name for rec_dir in rec_paths.iterdir() if rec_dir.is_dir()]
-        rec_dirs.sort()
-        return rec_dirs
+        return list(self.receivers)
 
     def get_receiver_coords(self):
         rec_names = []
         rec_lat = []
         rec_lon = []
-        at_file = f"{self.root_dir}/Sites.txt"
-        rec_file_name = Path(self.archive_name, at_file)
-        if rec_file_name.exists():
-            with rec_file_name.open(mode='r') as rec_file:
+        if self.sites_info:
+            with ZipFile(self.archive_name) as archive, io.TextIOWrapper(archive.open(self.sites_info)) as rec_file:
                 _ = rec_file.readline()
                 for line in rec_file:
                     data = line.split()
@@ -78,40 +319,49 @@ class GnssArchive:
                     rec_lon.append(float(data[2]))
         return rec_names, rec_lon, rec_lat
 
-    def parse_gnss_archive(self, parsed_dir, filter_sec, min_elm=30):
-        out_file_name = f"{self.get_parsed_file_stem(parsed_dir, filter_sec)}.txt"
-        rec_num_file = f"{self.get_parsed_file_stem(parsed_dir, filter_sec)}.num"
+    @staticmethod
+    def __write_receivers(results, out_file_name, journal: GnssJournal, rec_count):
+        with open(out_file_name, mode='ab') as out_file:
+            for rec_num, (rec_dir, blocks) in enumerate(results, start=1):
+                print(f"{rec_num} of {rec_count}.")
+                units = []
+                for prn, block in blocks:
+                    start = out_file.tell()
+                    out_file.write(block)
+                    units.append((rec_dir, prn, start, out_file.tell()))
+                out_file.flush()
+                os.fsync(out_file.fileno())
+                journal.commit(units)
+
+    def parse_gnss_archive(self, parsed_dir, filter_sec, min_elm=30, out_format='txt', workers=1):
+        out_ext = PARSED_FORMATS.get(out_format)
+        if not out_ext:
+            raise ValueError(f"Wrong output format. Must be one of {', '.join(PARSED_FORMATS)}")
+        out_file_name = f"{self.get_parsed_file_stem(parsed_dir, filter_sec)}{out_ext}"
+        journal = GnssJournal(f"{out_file_name}{JOURNAL_SUFFIX}")
+        journal.rollback(out_file_name)
         filter_dir = self.get_filter_dir(filter_sec)
-        if not os.path.isfile(rec_num_file):
-            with open(rec_num_file, mode='w') as num_file:
-                num_file.write('0')
         rec_dirs = self.get_receiver_list()
         print(rec_dirs)
-        rec_count = len(rec_dirs)
-        with open(rec_num_file, mode='r') as num_file:
-            rec_index = int(num_file.read())
-        with open(out_file_name, "a") as out_file:
-            for i in range(rec_index, rec_count):
-                gnss_data = []
-                rec_dir = rec_dirs[rec_index]
-                rec_num = rec_index + 1
-                print(f"{rec_num} of {rec_count}.")
-                for j in range(1, 33):
-                    at_file = f"{self.root_dir}/{rec_dir}/{filter_dir}/G{str(j).zfill(2)}.txt"
-                    g_file = Path(self.archive_name, at_file)
-                    if g_file.exists():
-                        with g_file.open(mode='r') as txt:
-                            gnss_data_title = txt.readline().split()
-                            lines_raw = txt.readlines()
-                        lines = list(filter(lambda x:
-                                            float(x.split()[gnss_data_title.index('elm')]) > min_elm,
-                                            lines_raw))
-                        gnss_data.extend(lines)
-                out_file.writelines(gnss_data)
-                out_file.flush()
-                rec_index += 1
-                with open(rec_num_file, mode='w') as num_file:
-                    num_file.write(str(rec_index))
+        filter_members = self.receiver_members[filter_dir]
+        jobs = []
+        for rec_dir in rec_dirs:
+            members = [info for info in filter_members.get(rec_dir, [])
+                       if not journal.is_done(rec_dir, get_member_prn(info.filename))]
+            if members:
+                jobs.append((rec_dir, members))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=open_worker_archive,
+                                     initargs=(self.archive_name,)) as executor:
+                futures = [executor.submit(read_worker_receiver_data, rec_dir, members, min_elm, out_format)
+                           for rec_dir, members in jobs]
+                self.__write_receivers((future.result() for future in as_completed(futures)), out_file_name,
+                                       journal, len(jobs))
+        else:
+            with ZipFile(self.archive_name) as archive:
+                results = (read_receiver_data(archive, rec_dir, members, min_elm, out_format)
+                           for rec_dir, members in jobs)
+                self.__write_receivers(results, out_file_name, journal, len(jobs))
         print("Reading is completed.")
 
 
@@ -121,8 +371,9 @@ class GnssData:
         self.coord_values: dict | None = {'lon': None, 'lon_span': None,
                                           'lat': None, 'lat_span': None}
         self.time_values: dict | None = {'time': None, 'time_span': None}
-        self.data_title: list = ['hour', 'min', 'sec', 'dTEC', 'azm', 'elm', 'gdlat', 'gdlon']
-        self.data: list = []
+        self.data_title: list = list(PARSED_TITLE)
+        self.data: np.ndarray = np.empty(0, dtype=PARSED_DTYPE)
+        self.index: GnssIndex | None = None
         self.time_dtec: list = []
         self.lon_lat_dtec: list = []
         self.lon_time_dtec: list = []
@@ -183,9 +434,23 @@ class GnssData:
 
     def read_gnss_data(self, file_name):
         self.add_dir = '/'.join(file_name.split('/')[-4:-1])
-        if not self.data:
-            with open(file_name, mode='r') as in_file:
-                self.data = in_file.readlines()
+        if not len(self.data):
+            self.data = read_parsed_data(file_name)
+            self.index = GnssIndex.load_or_build(file_name, self.data)
+
+    @staticmethod
+    def __get_row_times(rows, current_date: dt.date):
+        unique_seconds, inverse = np.unique(get_day_seconds(rows), return_inverse=True)
+        midnight = dt.datetime.combine(current_date, dt.time())
+        unique_times = [midnight + dt.timedelta(seconds=x) for x in unique_seconds.tolist()]
+        unique_labels = [x.strftime(TIME_FORMAT) for x in unique_times]
+        inverse = inverse.tolist()
+        return [unique_times[i] for i in inverse], [unique_labels[i] for i in inverse]
+
+    @staticmethod
+    def __write_rows(file_name, *columns):
+        with open(file_name, mode='w') as out_file:
+            out_file.write(''.join(['\t'.join(map(str, row)) + '\n' for row in zip(*columns)]))
 
     def get_time_dtec(self, out_dir, coord_values, current_date: dt.date):
         self.coord_values = coord_values
@@ -194,30 +459,24 @@ class GnssData:
             with open(time_file_name, mode='r') as time_file:
                 raw_data = [line.split('\t') for line in time_file]
                 time_dtec = list(zip(*raw_data))
-                time_data = [dt.datetime.strptime(x, TIME_FORMAT) for x in time_dtec[0]]
+                time_data = parse_time_values(time_dtec[0])
                 dtec_data = list(map(float, time_dtec[1]))
                 self.time_dtec = list(zip(time_data, dtec_data))
         else:
-            self.time_dtec = []
             current_lon = self.coord_values['lon'].get_float_degs()
             lon_span = self.coord_values['lon_span'].get_float_degs()
             current_lat = self.coord_values['lat'].get_float_degs()
             lat_span = self.coord_values['lat_span'].get_float_degs()
-            with open(time_file_name, mode='w') as time_file:
-                for line in self.data:
-                    data = list(map(float, line.split()))
-                    g_data = dict(zip(self.data_title, data))
-                    if all((g_data['gdlat'] >= current_lat - lat_span / 2,
-                            g_data['gdlat'] <= current_lat + lat_span / 2,
-                            g_data['gdlon'] >= current_lon - lon_span / 2,
-                            g_data['gdlon'] <= current_lon + lon_span / 2)):
-                        c_time = dt.datetime.combine(current_date, dt.time(int(g_data['hour']),
-                                                                           int(g_data['min']),
-                                                                           int(g_data['sec'])))
-                        current_time = c_time.strftime(TIME_FORMAT)
-                        time_dtec_data = (c_time, g_data['dTEC'])
-                        self.time_dtec.append(time_dtec_data)
-                        time_file.write(f"{current_time}\t{g_data['dTEC']}\n")
+            lat_range = (current_lat - lat_span / 2, current_lat + lat_span / 2)
+            lon_range = (current_lon - lon_span / 2, current_lon + lon_span / 2)
+            rows = self.data[self.index.get_box_rows(lat_range, lon_range)]
+            mask = ((rows['gdlat'] >= lat_range[0]) & (rows['gdlat'] <= lat_range[1]) &
+                    (rows['gdlon'] >= lon_range[0]) & (rows['gdlon'] <= lon_range[1]))
+            rows = rows[mask]
+            time_data, time_labels = self.__get_row_times(rows, current_date)
+            dtec_data = rows['dTEC'].tolist()
+            self.time_dtec = list(zip(time_data, dtec_data))
+            self.__write_rows(time_file_name, time_labels, dtec_data)
 
     def get_lon_lat_dtec(self, out_dir, time_values):
         self.time_values = time_values
@@ -226,21 +485,17 @@ class GnssData:
             with open(coord_file_name, mode='r') as coord_file:
                 self.lon_lat_dtec = [list(map(float, line.split())) for line in coord_file]
         else:
-            self.lon_lat_dtec = []
-            with open(coord_file_name, mode='w') as coord_file:
-                for line in self.data:
-                    data = list(map(float, line.split()))
-                    g_data = dict(zip(self.data_title, data))
-                    current_time = self.time_values['time']
-                    time_span = self.time_values['time_span']
-                    c_time = dt.datetime.combine(current_time.date(),
-                                                 dt.time(int(g_data['hour']), int(g_data['min']), int(g_data['sec'])))
-                    time_cond = ((c_time >= current_time - time_span / 2) and
-                                 (c_time <= current_time + time_span / 2))
-                    if time_cond:
-                        lon_lat_dtec_data = [g_data['gdlon'], g_data['gdlat'], g_data['dTEC']]
-                        self.lon_lat_dtec.append(lon_lat_dtec_data)
-                        coord_file.write(f"{g_data['gdlon']}\t{g_data['gdlat']}\t{g_data['dTEC']}\n")
+            current_time = self.time_values['time']
+            time_span = self.time_values['time_span']
+            midnight = dt.datetime.combine(current_time.date(), dt.time())
+            min_seconds = (current_time - time_span / 2 - midnight).total_seconds()
+            max_seconds = (current_time + time_span / 2 - midnight).total_seconds()
+            rows = self.data[self.index.get_time_rows(min_seconds, max_seconds)]
+            lon_data = rows['gdlon'].tolist()
+            lat_data = rows['gdlat'].tolist()
+            dtec_data = rows['dTEC'].tolist()
+            self.lon_lat_dtec = [list(item) for item in zip(lon_data, lat_data, dtec_data)]
+            self.__write_rows(coord_file_name, lon_data, lat_data, dtec_data)
 
     def get_lon_time_dtec(self, out_dir, coord_values, current_date: dt.date):
         self.coord_values = coord_values
@@ -249,27 +504,21 @@ class GnssData:
             with open(lon_time_file_name, mode='r') as lon_time_file:
                 raw_data = [line.split('\t') for line in lon_time_file]
                 lon_time_dtec = list(zip(*raw_data))
-                time_data = [dt.datetime.strptime(x, TIME_FORMAT) for x in lon_time_dtec[0]]
+                time_data = parse_time_values(lon_time_dtec[0])
                 lon_data = list(map(float, lon_time_dtec[1]))
                 dtec_data = list(map(float, lon_time_dtec[2]))
-                self.time_dtec = list(zip(time_data, lon_data, dtec_data))
+                self.lon_time_dtec = list(zip(time_data, lon_data, dtec_data))
         else:
-            self.lon_time_dtec = []
             current_lat = self.coord_values['lat'].get_float_degs()
             lat_span = self.coord_values['lat_span'].get_float_degs()
-            with open(lon_time_file_name, mode='w') as lon_time_file:
-                for line in self.data:
-                    data = list(map(float, line.split()))
-                    g_data = dict(zip(self.data_title, data))
-                    if all((g_data['gdlat'] >= current_lat - lat_span / 2,
-                            g_data['gdlat'] <= current_lat + lat_span / 2)):
-                        c_time = dt.datetime.combine(current_date, dt.time(int(g_data['hour']),
-                                                                           int(g_data['min']),
-                                                                           int(g_data['sec'])))
-                        current_time = c_time.strftime(TIME_FORMAT)
-                        lon_time_dtec_data = (c_time, g_data['gdlon'], g_data['dTEC'])
-                        self.lon_time_dtec.append(lon_time_dtec_data)
-                        lon_time_file.write(f"{current_time}\t{g_data['gdlon']}\t{g_data['dTEC']}\n")
+            lat_range = (current_lat - lat_span / 2, current_lat + lat_span / 2)
+            rows = self.data[self.index.get_box_rows(lat_range=lat_range)]
+            rows = rows[(rows['gdlat'] >= lat_range[0]) & (rows['gdlat'] <= lat_range[1])]
+            time_data, time_labels = self.__get_row_times(rows, current_date)
+            lon_data = rows['gdlon'].tolist()
+            dtec_data = rows['dTEC'].tolist()
+            self.lon_time_dtec = list(zip(time_data, lon_data, dtec_data))
+            self.__write_rows(lon_time_file_name, time_labels, lon_data, dtec_data)
 
     def get_lat_time_dtec(self, out_dir, coord_values, current_date: dt.date):
         self.coord_values = coord_values
@@ -278,30 +527,26 @@ class GnssData:
             with open(lat_time_file_name, mode='r') as lat_time_file:
                 raw_data = [line.split('\t') for line in lat_time_file]
                 lat_time_dtec = list(zip(*raw_data))
-                time_data = [dt.datetime.strptime(x, TIME_FORMAT) for x in lat_time_dtec[0]]
+                time_data = parse_time_values(lat_time_dtec[0])
                 lat_data = list(map(float, lat_time_dtec[1]))
                 dtec_data = list(map(float, lat_time_dtec[2]))
-                self.time_dtec = list(zip(time_data, lat_data, dtec_data))
+                self.lat_time_dtec = list(zip(time_data, lat_data, dtec_data))
         else:
-            self.lat_time_dtec = []
             current_lon = self.coord_values['lon'].get_float_degs()
             lon_span = self.coord_values['lon_span'].get_float_degs()
-            with open(lat_time_file_name, mode='w') as lat_time_file:
-                for line in self.data:
-                    data = list(map(float, line.split()))
-                    g_data = dict(zip(self.data_title, data))
-                    if all((g_data['gdlon'] >= current_lon - lon_span / 2,
-                            g_data['gdlon'] <= current_lon + lon_span / 2)):
-                        c_time = dt.datetime.combine(current_date, dt.time(int(g_data['hour']),
-                                                                           int(g_data['min']),
-                                                                           int(g_data['sec'])))
-                        current_time = c_time.strftime(TIME_FORMAT)
-                        lat_time_dtec_data = (c_time, g_data['gdlat'], g_data['dTEC'])
-                        self.lat_time_dtec.append(lat_time_dtec_data)
-                        lat_time_file.write(f"{current_time}\t{g_data['gdlat']}\t{g_data['dTEC']}\n")
+            lon_range = (current_lon - lon_span / 2, current_lon + lon_span / 2)
+            rows = self.data[self.index.get_box_rows(lon_range=lon_range)]
+            rows = rows[(rows['gdlon'] >= lon_range[0]) & (rows['gdlon'] <= lon_range[1])]
+            time_data, time_labels = self.__get_row_times(rows, current_date)
+            lat_data = rows['gdlat'].tolist()
+            dtec_data = rows['dTEC'].tolist()
+            self.lat_time_dtec = list(zip(time_data, lat_data, dtec_data))
+            self.__write_rows(lat_time_file_name, time_labels, lat_data, dtec_data)
 
 
 if __name__ == '__main__':
-    _, cmd_archive_name, cmd_parsed_dir, cmd_filter_sec = argv
+    _, cmd_archive_name, cmd_parsed_dir, cmd_filter_sec, *cmd_options = argv
     archive = GnssArchive(cmd_archive_name)
-    archive.parse_gnss_archive(cmd_parsed_dir, int(cmd_filter_sec))
+    archive.parse_gnss_archive(cmd_parsed_dir, int(cmd_filter_sec),
+                               out_format=cmd_options[0] if cmd_options else 'txt',
+                               workers=int(cmd_options[1]) if len(cmd_options) > 1 else 1)
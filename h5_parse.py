@@ -4,15 +4,30 @@ import os
 import argparse
 import h5py
 import datetime as dt
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import repeat
 
-from utils.analysis import estimate_mean, interp_data
+from utils.analysis import estimate_mean_arcs, interp_data
 import madrigal
+from gnss import PARSED_TITLE, PARSED_FORMATS, create_parsed_records
 
 SITE_DIR = 'sites/'
 KEYS_ALL = ('time', 'tec_data', 'gdlat', 'glon', 'azm', 'elm', 'sat_id', 'gps_site')
 KEYS_SITE = KEYS_ALL[:-1]
 KEYS_SAT = KEYS_SITE[:-1]
+H5_FIELDS = ['year', 'month', 'day', 'hour', 'min', 'sec', 'gnss_type', 'gps_site', 'sat_id',
+             'los_tec', 'gdlat', 'glon', 'azm', 'elm']
+SITE_FIELDS = ['gps_site', 'gdlatr', 'gdlonr']
+DELTA_T = 30
+OUTPUT_LINE_FORMAT = "%d\t%d\t%d\t%.3f\t%.2f\t%.2f\t%.2f\t%.2f\n"
+OUTPUT_PRECISION = {'dTEC': 3, 'azm': 2, 'elm': 2, 'gdlat': 2, 'gdlon': 2}
 EU_BORDERS = {'min_lat': 28, 'max_lat': 80, 'min_lon': -10, 'max_lon': 50}
+REGION_BORDERS = {'EU': EU_BORDERS,
+                  'US': {'min_lat': 24, 'max_lat': 50, 'min_lon': -125, 'max_lon': -66},
+                  'JP': {'min_lat': 24, 'max_lat': 46, 'min_lon': 122, 'max_lon': 146},
+                  'UA': {'min_lat': 44, 'max_lat': 53, 'min_lon': 22, 'max_lon': 41}}
+ROW_MEMORY = 400
 
 # Set up basic logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
@@ -44,185 +59,290 @@ def check_prepare_file(date: dt.date, input_file_path: str):
         madrigal.download_hdf5(date, input_file, input_file_path)
 
 
+def filter_receivers(data, borders):
+    sites = []
+    for row in data:
+        if (borders['min_lat'] <= row['gdlatr'] <= borders['max_lat'] and
+                borders['min_lon'] <= row['gdlonr'] <= borders['max_lon']):
+            record = dict()
+            record['gps_site'] = row['gps_site'].decode('utf-8').strip()
+            record['gdlatr'] = row['gdlatr']
+            record['gdlonr'] = row['gdlonr']
+            sites.append(record)
+    sites.sort(key=lambda x: x['gps_site'])
+    return sites
+
+
 def retrieve_receivers(file_path: str, borders=None):
     if borders is None:
         borders = EU_BORDERS
-    sites = []
     with h5py.File(file_path, 'r') as hdf:
-        data = hdf['Data/Table Layout'][:]
-        for row in data:
-            if (borders['min_lat'] <= row['gdlatr'] <= borders['max_lat'] and
-                    borders['min_lon'] <= row['gdlonr'] <= borders['max_lon']):
-                record = dict()
-                record['gps_site'] = row['gps_site'].decode('utf-8').strip()
-                record['gdlatr'] = row['gdlatr']
-                record['gdlonr'] = row['gdlonr']
-                sites.append(record)
-    sites.sort(key=lambda x: x['gps_site'])
-    return sites
+        data = hdf['Data/Table Layout'].fields(SITE_FIELDS)[:]
+    return filter_receivers(data, borders)
+
+
+def retrieve_region_receivers(file_path: str, regions):
+    with h5py.File(file_path, 'r') as hdf:
+        data = hdf['Data/Table Layout'].fields(SITE_FIELDS)[:]
+    return {region: filter_receivers(data, REGION_BORDERS[region]) for region in regions}
 
 
-def read_gnss_data(file_path):
+def get_row_number(file_path):
     with h5py.File(file_path, 'r') as hdf:
-        data = hdf['Data/Table Layout'][:]
-    return data
-
-
-def retrieve_chunk(gnss_data, gnss_type, gps_sites, row_chunk):
-    for i in range(0, len(gnss_data), row_chunk):
-        results = create_result_dict(KEYS_ALL)
-        data = gnss_data[i:i + row_chunk]
-        for row in data:
-            gps_site_label = row['gps_site'].decode('utf-8').strip()
-            if (row['gnss_type'].decode('utf-8').strip() == gnss_type and
-                    gps_site_label in gps_sites):
-                results['time'].append(dt.datetime(year=row['year'], month=row['month'], day=row['day'],
-                                                   hour=row['hour'], minute=row['min'], second=row['sec']))
-                results['tec_data'].append(row['los_tec'])
-                results['gdlat'].append(row['gdlat'])
-                results['glon'].append(row['glon'])
-                results['azm'].append(row['azm']),
-                results['elm'].append(row['elm'])
-                results['sat_id'].append(row['sat_id'])
-                results['gps_site'].append(gps_site_label)
+        return len(hdf['Data/Table Layout'])
+
+
+def read_gnss_data(file_path, row_chunk):
+    with h5py.File(file_path, 'r') as hdf:
+        dataset = hdf['Data/Table Layout']
+        fields = dataset.fields(H5_FIELDS)
+        for i in range(0, len(dataset), row_chunk):
+            yield fields[i:i + row_chunk]
+
+
+def get_epoch_seconds(data) -> np.ndarray:
+    days = ((data['year'] - 1970).astype('datetime64[Y]') +
+            (data['month'] - 1).astype('timedelta64[M]')).astype('datetime64[D]')
+    days = days + (data['day'] - 1).astype('timedelta64[D]')
+    seconds = data['hour'] * 3600 + data['min'] * 60 + data['sec']
+    return days.astype(np.int64) * 86400 + seconds.astype(np.int64)
+
+
+def get_code_mask(values, codes):
+    # Fixed-width byte columns: NumPy ignores trailing NUL padding on comparison, but space padding
+    # would remain, so the values are decoded and stripped like the former per-row filter did.
+    unique_values, inverse = np.unique(values, return_inverse=True)
+    unique_mask = np.isin(np.char.strip(np.char.decode(unique_values, 'utf-8')), codes)
+    return unique_mask[inverse.ravel()]
+
+
+def retrieve_columns(data_chunks, gnss_type, gps_sites):
+    for data in data_chunks:
+        mask = get_code_mask(data['gnss_type'], [gnss_type]) & get_code_mask(data['gps_site'], gps_sites)
+        data = data[mask]
+        results = dict()
+        results['time'] = get_epoch_seconds(data)
+        results['tec_data'] = data['los_tec']
+        results['gdlat'] = data['gdlat']
+        results['glon'] = data['glon']
+        results['azm'] = data['azm']
+        results['elm'] = data['elm']
+        results['sat_id'] = data['sat_id']
+        results['gps_site'] = data['gps_site']
         yield results
 
 
-def append_output_file(file_path, res_final, min_elm=30.0):
-    with open(file_path, mode='a') as file:
-        for ind in range(len(res_final['tec_data'])):
-            if res_final['elm'][ind] > min_elm:
-                line = (f"{res_final['time'][ind].hour}\t"
-                        f"{res_final['time'][ind].minute}\t"
-                        f"{res_final['time'][ind].second}\t"
-                        f"{res_final['tec_data'][ind]:.3f}\t"
-                        f"{res_final['azm'][ind]:.2f}\t"
-                        f"{res_final['elm'][ind]:.2f}\t"
-                        f"{res_final['gdlat'][ind]:.2f}\t"
-                        f"{res_final['glon'][ind]:.2f}\n")
-                file.write(line)
+def group_columns(columns):
+    order = np.lexsort((columns['time'], columns['sat_id'], columns['gps_site']))
+    return {key: columns[key][order] for key in columns}
 
 
-def analyze_gnss_data(input_path, output_path, date_str, window, filter_order,
-                      time_gap_int, chunk_size, min_elm, gnss_type, region):
-    date = parse_date(date_str)
+def group_bounds(values):
+    if len(values) == 0:
+        return []
+    breaks = np.flatnonzero(values[1:] != values[:-1]) + 1
+    bounds = np.concatenate(([0], breaks, [len(values)]))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def iter_arcs(site_columns, time_gap):
+    for sat_start, sat_stop in group_bounds(site_columns['sat_id']):
+        time_diff = np.diff(site_columns['time'][sat_start:sat_stop])
+        break_indices = np.flatnonzero(time_diff > time_gap) + 1 + sat_start
+        bounds = np.concatenate(([sat_start], break_indices, [sat_stop]))
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            yield {key: site_columns[key][start:stop] for key in KEYS_SAT}
+
+
+def process_site(site_columns, window, filter_order, time_gap):
+    res_final = create_result_dict(KEYS_SAT)
+    win_points = int(window / DELTA_T)
+    for arc in iter_arcs(site_columns, time_gap):
+        start = arc['time'][0]
+        end = arc['time'][-1]
+        if end - start < window:
+            continue
+        time_interp = np.arange(start, end + DELTA_T, DELTA_T)
+        los_interp, azm_interp, elm_interp, gdlat_interp, glon_interp = interp_data(
+            arc['time'], np.vstack([arc[key] for key in ('tec_data', 'azm', 'elm', 'gdlat', 'glon')]),
+            time_interp, k=1)
+        res_final['tec_data'].append(los_interp)
+        res_final['time'].append(time_interp)
+        res_final['azm'].append(azm_interp)
+        res_final['elm'].append(elm_interp)
+        res_final['gdlat'].append(gdlat_interp)
+        res_final['glon'].append(glon_interp)
+    if not res_final['time']:
+        return {key: np.empty(0) for key in KEYS_SAT}
+    arc_lengths = np.array([len(item) for item in res_final['time']])
+    arc_stops = np.cumsum(arc_lengths)
+    arc_bounds = np.column_stack((arc_stops - arc_lengths, arc_stops))
+    res_final = {key: np.concatenate(res_final[key]) for key in KEYS_SAT}
+    res_final['tec_data'] -= estimate_mean_arcs(res_final['tec_data'], arc_bounds, window=win_points,
+                                                order=filter_order)
+    return res_final
+
+
+def save_columns(columns, columns_dir):
+    for key in KEYS_SITE:
+        np.save(f"{columns_dir}/{key}.npy", columns[key])
+
+
+def process_site_mapped(columns_dir, start, stop, window, filter_order, time_gap):
+    site_columns = {key: np.load(f"{columns_dir}/{key}.npy", mmap_mode='r')[start:stop] for key in KEYS_SITE}
+    return process_site(site_columns, window, filter_order, time_gap)
+
+
+def append_output_file(file_path, res_final, min_elm=30.0, out_format='txt'):
+    mask = res_final['elm'] > min_elm
+    day_seconds = res_final['time'][mask].astype(np.int64) % 86400
+    columns = {'hour': day_seconds // 3600,
+               'min': day_seconds // 60 % 60,
+               'sec': day_seconds % 60,
+               'dTEC': res_final['tec_data'][mask],
+               'azm': res_final['azm'][mask],
+               'elm': res_final['elm'][mask],
+               'gdlat': res_final['gdlat'][mask],
+               'gdlon': res_final['glon'][mask]}
+    if out_format == 'bin':
+        for name, digits in OUTPUT_PRECISION.items():
+            columns[name] = np.char.mod(f"%.{digits}f", columns[name]).astype(np.float64)
+        with open(file_path, mode='ab') as file:
+            create_parsed_records(columns).tofile(file)
+    else:
+        rows = zip(*[columns[name].tolist() for name in PARSED_TITLE])
+        block = ''.join([OUTPUT_LINE_FORMAT % row for row in rows])
+        with open(file_path, mode='a') as file:
+            file.write(block)
+
+
+def prepare_day_files(input_path, date: dt.date):
     directory = f"{input_path}/{date.year}/"
     data_file, site_file = create_file_names(date)
     data_file_path = f"{directory}{data_file}"
     site_file_path = f"{directory}{SITE_DIR}{site_file}"
-    date_dir = date.strftime('%Y-%m-%d')
-    output_dir = f"{output_path}/{region}/{date.year}/{date_dir}/{window}/"
-    output_file = f"{date_dir}_{window}.txt"
-    output_site_file = "Sites.txt"
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(f"{directory}{SITE_DIR}", exist_ok=True)
     check_prepare_file(date, site_file_path)
     check_prepare_file(date, data_file_path)
-    sites = retrieve_receivers(site_file_path)
-    with open(output_dir + output_site_file, mode='w') as f_site:
-        f_site.write('site\tlat\tlon\n')
-        for site in sites:
-            f_site.write(f"{site['gps_site']}\t{site['gdlatr']:.2f}\t{site['gdlonr']:.2f}\n")
-    gps_sites = [item['gps_site'] for item in sites]
-    delta_t = dt.timedelta(seconds=30)
-    time_gap = dt.timedelta(seconds=time_gap_int)
-    window_time = dt.timedelta(seconds=window)
-    logging.info('Start GNSS data reading...')
-    gnss_data = read_gnss_data(data_file_path)
-    logging.info('End GNSS data reading...')
-    res_sites = create_result_dict(KEYS_ALL)
+    return data_file_path, site_file_path
+
+
+def analyze_gnss_data(input_path, output_path, date_str, window, filter_order,
+                      time_gap_int, chunk_size, min_elm, gnss_type, regions, workers=1, out_format='txt'):
+    if isinstance(regions, str):
+        regions = [regions]
+    date = parse_date(date_str)
+    date_dir = date.strftime('%Y-%m-%d')
+    output_file = f"{date_dir}_{window}{PARSED_FORMATS[out_format]}"
+    output_site_file = "Sites.txt"
+    data_file_path, site_file_path = prepare_day_files(input_path, date)
+    region_sites = retrieve_region_receivers(site_file_path, regions)
+    site_outputs = dict()
+    for region in regions:
+        output_dir = f"{output_path}/{region}/{date.year}/{date_dir}/{window}/"
+        os.makedirs(output_dir, exist_ok=True)
+        with open(output_dir + output_site_file, mode='w') as f_site:
+            f_site.write('site\tlat\tlon\n')
+            for site in region_sites[region]:
+                f_site.write(f"{site['gps_site']}\t{site['gdlatr']:.2f}\t{site['gdlonr']:.2f}\n")
+                site_outputs.setdefault(site['gps_site'], []).append(output_dir + output_file)
+    gps_sites = sorted(site_outputs)
+    columns_root = f"{output_path}/{regions[0]}/{date.year}/{date_dir}/{window}/"
+    chunks = []
     logging.info('Start chunk reading...')
-    results_gen = retrieve_chunk(gnss_data, gnss_type, gps_sites, chunk_size)
-    chunk_number = np.ceil(len(gnss_data) / chunk_size)
+    gnss_data = read_gnss_data(data_file_path, chunk_size)
+    results_gen = retrieve_columns(gnss_data, gnss_type, gps_sites)
+    chunk_number = np.ceil(get_row_number(data_file_path) / chunk_size)
     chunk_num = 0
     for results in results_gen:
         chunk_num += 1
         logging.debug(f"chunk {chunk_num} of {chunk_number}")
-        res_sites['time'].extend(results['time'])
-        res_sites['tec_data'].extend(results['tec_data'])
-        res_sites['gdlat'].extend(results['gdlat'])
-        res_sites['glon'].extend(results['glon'])
-        res_sites['azm'].extend(results['azm']),
-        res_sites['elm'].extend(results['elm'])
-        res_sites['gps_site'].extend(results['gps_site'])
-        res_sites['sat_id'].extend(results['sat_id'])
+        chunks.append(results)
+    if not chunks:
+        logging.info('No data rows were found.')
+        return
+    res_sites = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in KEYS_ALL}
     logging.info('End chunk reading...')
-    del gnss_data
-    win_points = int(window_time / delta_t)
-    for gps_site in gps_sites:
-        logging.info('gps_site = %s, (%d of %d)', gps_site, gps_sites.index(gps_site) + 1, len(gps_sites))
-        res_filtered = create_result_dict(KEYS_SITE)
-        for i in range(len(res_sites['time'])):
-            if res_sites['gps_site'][i] == gps_site:
-                res_filtered['time'].append(res_sites['time'][i])
-                res_filtered['tec_data'].append(res_sites['tec_data'][i])
-                res_filtered['gdlat'].append(res_sites['gdlat'][i])
-                res_filtered['glon'].append(res_sites['glon'][i])
-                res_filtered['azm'].append(res_sites['azm'][i]),
-                res_filtered['elm'].append(res_sites['elm'][i])
-                res_filtered['sat_id'].append(res_sites['sat_id'][i])
-        sats = list(set(res_filtered['sat_id']))
-        sats.sort()
-        for sat_id in sats:
-            res_sat = create_result_dict(KEYS_SAT)
-            for i in range(len(res_filtered['time'])):
-                if res_filtered['sat_id'][i] == sat_id:
-                    res_sat['time'].append(res_filtered['time'][i])
-                    res_sat['tec_data'].append(res_filtered['tec_data'][i])
-                    res_sat['gdlat'].append(res_filtered['gdlat'][i])
-                    res_sat['glon'].append(res_filtered['glon'][i])
-                    res_sat['azm'].append(res_filtered['azm'][i]),
-                    res_sat['elm'].append(res_filtered['elm'][i])
-            if res_sat['time']:
-                time_diff = np.diff(res_sat['time'])
-                break_indices = np.where(time_diff > time_gap)[0]
-                res_split = create_result_dict(KEYS_SAT)
-                if len(break_indices) > 0:
-                    res_split['tec_data'] = np.split(res_sat['tec_data'], np.array(break_indices) + 1)
-                    res_split['time'] = np.split(res_sat['time'], np.array(break_indices) + 1)
-                    res_split['azm'] = np.split(res_sat['azm'], np.array(break_indices) + 1)
-                    res_split['elm'] = np.split(res_sat['elm'], np.array(break_indices) + 1)
-                    res_split['gdlat'] = np.split(res_sat['gdlat'], np.array(break_indices) + 1)
-                    res_split['glon'] = np.split(res_sat['glon'], np.array(break_indices) + 1)
-                else:
-                    res_split['tec_data'].append(res_sat['tec_data'])
-                    res_split['time'].append(res_sat['time'])
-                    res_split['azm'].append(res_sat['azm'])
-                    res_split['elm'].append(res_sat['elm'])
-                    res_split['gdlat'].append(res_sat['gdlat'])
-                    res_split['glon'].append(res_sat['glon'])
-                res_final = create_result_dict(KEYS_SAT)
-                for ind in range(len(res_split['tec_data'])):
-                    start = res_split['time'][ind][0]
-                    end = res_split['time'][ind][-1]
-                    if end - start < window_time:
-                        continue
-                    else:
-                        time_interp = np.arange(start, end + delta_t, delta_t).astype(dt.datetime)
-                        los_interp = interp_data(res_split['time'][ind], res_split['tec_data'][ind], time_interp, k=1)
-                        azm_interp = interp_data(res_split['time'][ind], res_split['azm'][ind], time_interp, k=1)
-                        elm_interp = interp_data(res_split['time'][ind], res_split['elm'][ind], time_interp, k=1)
-                        gdlat_interp = interp_data(res_split['time'][ind], res_split['gdlat'][ind], time_interp, k=1)
-                        glon_interp = interp_data(res_split['time'][ind], res_split['glon'][ind], time_interp, k=1)
-                        if len(los_interp) < window:
-                            window = len(los_interp)
-                        current_mean_tec = estimate_mean(los_interp, window=win_points, order=filter_order)
-                        current_d_tec = los_interp - current_mean_tec
-                        res_final['tec_data'].extend(current_d_tec.tolist())
-                        res_final['time'].extend(time_interp.tolist())
-                        res_final['azm'].extend(azm_interp.tolist())
-                        res_final['elm'].extend(elm_interp.tolist())
-                        res_final['gdlat'].extend(gdlat_interp.tolist())
-                        res_final['glon'].extend(glon_interp.tolist())
-
-                append_output_file(output_dir + output_file, res_final, min_elm)
+    del gnss_data, chunks
+    logging.info('Start grouping...')
+    res_sites = group_columns(res_sites)
+    site_bounds = group_bounds(res_sites['gps_site'])
+    logging.info('End grouping...')
+    if workers > 1:
+        with tempfile.TemporaryDirectory(dir=columns_root) as columns_dir:
+            save_columns(res_sites, columns_dir)
+            starts, stops = zip(*site_bounds) if site_bounds else ((), ())
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results_gen = executor.map(process_site_mapped, repeat(columns_dir), starts, stops,
+                                           repeat(window), repeat(filter_order), repeat(time_gap_int))
+                for site_num, res_final in enumerate(results_gen):
+                    gps_site = res_sites['gps_site'][starts[site_num]].decode('utf-8').strip()
+                    logging.info('gps_site = %s, (%d of %d)', gps_site, site_num + 1, len(site_bounds))
+                    for file_path in site_outputs[gps_site]:
+                        append_output_file(file_path, res_final, min_elm, out_format)
+    else:
+        for site_num, (start, stop) in enumerate(site_bounds):
+            gps_site = res_sites['gps_site'][start].decode('utf-8').strip()
+            logging.info('gps_site = %s, (%d of %d)', gps_site, site_num + 1, len(site_bounds))
+            site_columns = {key: res_sites[key][start:stop] for key in KEYS_SITE}
+            res_final = process_site(site_columns, window, filter_order, time_gap_int)
+            for file_path in site_outputs[gps_site]:
+                append_output_file(file_path, res_final, min_elm, out_format)
+
+
+def estimate_day_memory(data_file_path):
+    return get_row_number(data_file_path) * ROW_MEMORY
 
 
+def run_batch(input_path, output_path, start_date: dt.date, end_date: dt.date, regions, window, filter_order,
+              time_gap_int, chunk_size, min_elm, gnss_type, workers=1, out_format='txt',
+              download_workers=1, compute_workers=1, memory_budget=None):
+    dates = [start_date + dt.timedelta(days=day) for day in range((end_date - start_date).days + 1)]
+    pending = []
+    running = dict()
+    used_memory = 0
+    with ThreadPoolExecutor(max_workers=download_workers) as downloader, \
+            ProcessPoolExecutor(max_workers=compute_workers) as computer:
+        downloads = {downloader.submit(prepare_day_files, input_path, date): date for date in dates}
+        while downloads or running or pending:
+            done, _ = wait(list(downloads) + list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in downloads:
+                    date = downloads.pop(future)
+                    try:
+                        memory = estimate_day_memory(future.result()[0])
+                    except Exception:
+                        logging.exception('%s: input files are not available', date)
+                        continue
+                    logging.info('%s: input files are ready', date)
+                    pending.append((date, memory))
+                else:
+                    date, memory = running.pop(future)
+                    used_memory -= memory
+                    try:
+                        future.result()
+                        logging.info('%s %s: dTEC estimation is completed', date, ' '.join(regions))
+                    except Exception:
+                        logging.exception('%s %s: dTEC estimation failed', date, ' '.join(regions))
+            while pending and len(running) < compute_workers:
+                date, memory = pending[0]
+                if running and memory_budget is not None and used_memory + memory > memory_budget:
+                    break
+                pending.pop(0)
+                future = computer.submit(analyze_gnss_data, input_path, output_path, date.strftime('%Y-%m-%d'),
+                                         window, filter_order, time_gap_int, chunk_size, min_elm, gnss_type,
+                                         regions, workers, out_format)
+                running[future] = (date, memory)
+                used_memory += memory
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Parse Madrigal hdf5 GNSS files to estimate dTEC variations.",
         formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument("date", help="Date in format YYYY-MM-DD.", type=str)
+    parser.add_argument("date", help="Date (first date of a batch) in format YYYY-MM-DD.", type=str)
+    parser.add_argument("end_date", help="Last date of a batch in format YYYY-MM-DD (date by default).",
+                        nargs='?', default=None, type=str)
     parser.add_argument("-i", "--input_path", help="Path to the local h5 files in format path/to/the/files.", type=str,
                         default="c:/Users/Sergii/Dell_D/GNSS/Raw/")
     parser.add_argument("-o","--output_path", help="Path for output files in format path/to/the/files.", type=str,
@@ -239,10 +359,31 @@ if __name__ == "__main__":
                         default=30.0, type=float)
     parser.add_argument("-g", "--gnss_type", help="Type of analyzed GNSS data (GPS or GLONASS).",
                         default='GPS', type=str)
-    parser.add_argument("-r", "--region", help="Earth region for analysis (EU, US, JP, UA, ...",
-                        default='EU', type=str)
+    parser.add_argument("-r", "--region", help="Earth regions for analysis (EU, US, JP, UA).",
+                        default=['EU'], nargs='+', choices=list(REGION_BORDERS), type=str)
+    parser.add_argument("-n", "--workers", help="Number of worker processes for per-receiver dTEC estimation.",
+                        default=1, type=int)
+    parser.add_argument("-p", "--output_format", help="Format of the parsed output file (txt or bin).",
+                        default='txt', choices=list(PARSED_FORMATS), type=str)
+    parser.add_argument("-d", "--download_workers", help="Number of days downloaded concurrently in batch mode.",
+                        default=1, type=int)
+    parser.add_argument("-j", "--compute_workers", help="Number of days processed concurrently in batch mode.",
+                        default=1, type=int)
+    parser.add_argument("-m", "--memory_budget",
+                        help="Approximate memory (in GB) shared by concurrently processed days in batch mode.",
+                        default=None, type=float)
     args = parser.parse_args()
-    analyze_gnss_data(input_path=args.input_path, output_path=args.output_path, date_str=args.date, window=args.window,
-                      filter_order=args.filter_order, time_gap_int=args.time_gap,
-                      chunk_size=args.chunk_size, min_elm=args.min_elevation,
-                      gnss_type=args.gnss_type, region=args.region)
+    if args.end_date is None:
+        analyze_gnss_data(input_path=args.input_path, output_path=args.output_path, date_str=args.date,
+                          window=args.window, filter_order=args.filter_order, time_gap_int=args.time_gap,
+                          chunk_size=args.chunk_size, min_elm=args.min_elevation,
+                          gnss_type=args.gnss_type, regions=args.region, workers=args.workers,
+                          out_format=args.output_format)
+    else:
+        run_batch(input_path=args.input_path, output_path=args.output_path, start_date=parse_date(args.date),
+                  end_date=parse_date(args.end_date) if args.end_date else parse_date(args.date),
+                  regions=args.region, window=args.window, filter_order=args.filter_order,
+                  time_gap_int=args.time_gap, chunk_size=args.chunk_size, min_elm=args.min_elevation,
+                  gnss_type=args.gnss_type, workers=args.workers, out_format=args.output_format,
+                  download_workers=args.download_workers, compute_workers=args.compute_workers,
+                  memory_budget=args.memory_budget * 1e9 if args.memory_budget else None)
@@ -1,6 +1,8 @@
+from functools import lru_cache
 import numpy as np
 from scipy import interpolate
-from scipy.signal import savgol_filter, windows
+from scipy.ndimage import convolve1d
+from scipy.signal import fftconvolve, savgol_coeffs, savgol_filter, windows
 from scipy.special import erf
 import matplotlib.pyplot as plt
 
@@ -17,6 +19,34 @@ def estimate_mean(signal, window, order):
     return savgol_filter(signal, window_length=window, polyorder=order)
 
 
+@lru_cache(maxsize=None)
+def get_savgol_kernel(window, order):
+    half_window = window // 2
+    positions = np.linspace(-1, 1, window)
+    fit_matrix = np.linalg.pinv(np.vander(positions, order + 1))
+    left_edge = np.vander(positions[:half_window], order + 1) @ fit_matrix
+    right_edge = np.vander(positions[window - half_window:], order + 1) @ fit_matrix
+    coeffs = savgol_coeffs(window, order)
+    for item in (coeffs, left_edge, right_edge):
+        item.flags.writeable = False
+    return coeffs, left_edge, right_edge
+
+
+def estimate_mean_arcs(signal, bounds, window, order):
+    signal = np.asarray(signal, dtype=np.float64)
+    starts, stops = np.asarray(bounds, dtype=np.int64).reshape(-1, 2).T
+    if np.any(stops - starts < window):
+        raise ValueError("window must be less than or equal to the length of every arc.")
+    coeffs, left_edge, right_edge = get_savgol_kernel(window, order)
+    trend = convolve1d(signal, coeffs, mode='constant')
+    half_window = window // 2
+    window_index = np.arange(window)
+    edge_index = np.arange(half_window)
+    trend[starts[:, None] + edge_index] = signal[starts[:, None] + window_index] @ left_edge.T
+    trend[stops[:, None] - half_window + edge_index] = signal[stops[:, None] - window + window_index] @ right_edge.T
+    return trend
+
+
 def define_indexes(i, signal, window):
     left_half = window // 2
     right_half = window - left_half
@@ -33,27 +63,54 @@ def define_indexes(i, signal, window):
 
 
 def estimate_sigma(signal, window):
-    sigma = []
+    signal = np.asarray(signal, dtype=np.float64)
     s_length = len(signal)
-    for i in range(0, s_length):
-        left_ind, right_ind = define_indexes(i, signal, window)
-        sigma.append(np.std(signal[left_ind: right_ind]))
-    return sigma
+    indexes = np.arange(s_length)
+    left_ind = np.maximum(indexes - window // 2, 0)
+    right_ind = np.minimum(indexes + window - window // 2, s_length)
+    # shifting by the mean keeps the cumulative sums small and the variance stable
+    shifted = signal - np.mean(signal) if s_length else signal
+    sum_1 = np.concatenate(([0.], np.cumsum(shifted)))
+    sum_2 = np.concatenate(([0.], np.cumsum(shifted * shifted)))
+    counts = right_ind - left_ind
+    mean = (sum_1[right_ind] - sum_1[left_ind]) / counts
+    variance = (sum_2[right_ind] - sum_2[left_ind]) / counts - mean * mean
+    return np.sqrt(np.maximum(variance, 0.))
+
+
+def convert_to_timestamps(x):
+    x = np.asarray(x)
+    if x.dtype == object:
+        return np.array([item.timestamp() for item in x])
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[s]').astype(np.int64)
+    return x.astype(np.float64)
+
+
+def interp_linear(x_input, y_input, x_res):
+    index = np.clip(np.searchsorted(x_input, x_res, side='right') - 1, 0, len(x_input) - 2)
+    x_left = x_input[index]
+    weight = (x_res - x_left) / (x_input[index + 1] - x_left)
+    y_left = y_input[..., index]
+    return y_left + weight * (y_input[..., index + 1] - y_left)
 
 
 def interp_data(x_input, y_input, x_res, k=3):
-    time_input = np.array([x.timestamp() for x in x_input])
-    time_res = np.array([x.timestamp() for x in x_res])
+    time_input = convert_to_timestamps(x_input)
+    time_res = convert_to_timestamps(x_res)
+    y_input = np.asarray(y_input, dtype=np.float64)
+    if k == 1:
+        return interp_linear(time_input, y_input, time_res)
+    if y_input.ndim > 1:
+        return np.array([interp_data(time_input, y_row, time_res, k=k) for y_row in y_input])
     tck = interpolate.splrep(time_input, y_input, k=k)
     return interpolate.splev(time_res, tck)
 
 
-def use_sigma_criteria(signal, window=12, k_coef=2.5):
-    flag = True
-    loop_lim = 100
+def use_sigma_criteria(signal, window=12, k_coef=2.5, loop_lim=100, return_cycles=False):
     cycle_count = 0
     s3 = None
-    while flag:
+    while True:
         s2 = savgol_filter(signal, window_length=window, polyorder=2)
         delta_s = signal - s2
         s_length = len(delta_s)
@@ -61,19 +118,24 @@ def use_sigma_criteria(signal, window=12, k_coef=2.5):
         s3[0] = s2[0]
         s3[s_length - 1] = s2[s_length - 1]
         sigma = estimate_sigma(signal=delta_s, window=window)
-        out_count = 0
+        outliers = np.abs(delta_s) > k_coef * sigma
+        replaced = np.copy(outliers)
+        replaced[0] = replaced[s_length - 1] = False
+        out_count = np.count_nonzero(replaced)
         cycle_count += 1
-        for i in range(1, s_length - 1):
-            if abs(delta_s[i]) > k_coef * sigma[i]:
-                out_count += 1
-                if abs(delta_s[i + 1]) > k_coef * sigma[i + 1]:
-                    s3[i] = s3[i - 1]
-                else:
-                    s3[i] = (s3[i - 1] + s3[i + 1]) / 2
-        if (out_count == 0) or (cycle_count == loop_lim):
-            flag = False
-        else:
-            signal = np.copy(s3)
+        if out_count:
+            # a run of outliers holds the last good value, its last item averages with the next one
+            indexes = np.arange(s_length)
+            last_good = np.maximum.accumulate(np.where(replaced, 0, indexes))
+            next_ind = np.minimum(indexes + 1, s_length - 1)
+            held = s3[last_good]
+            patched = np.where(outliers[next_ind], held, (held + s3[next_ind]) / 2)
+            s3[replaced] = patched[replaced]
+        if (out_count == 0) or (cycle_count == loop_lim) or np.array_equal(s3, signal):
+            break
+        signal = np.copy(s3)
+    if return_cycles:
+        return s3, cycle_count
     return s3
 
 
@@ -89,14 +151,11 @@ def bandpass_filter(signal, min_period, max_period, trend_removal=False, norm=Fa
         if norm:
             signal = signal / (trend + 1E-7)
     a = 40
-    s_length = len(signal)
+    signal = np.asarray(signal, dtype=np.float64)
+    s_length = signal.shape[-1]
     x = np.arange(-s_length + 1, s_length)
     y = u(x, a, min_period) - u(x, a, max_period)
-    s2 = []
-    for j in range(0, s_length):
-        val = np.sum([signal[j - k] * y[s_length + k - 1] for k in range(j - s_length + 1, j + 1)])
-        s2.append(val)
-    return np.array(s2)
+    return fftconvolve(signal, y.reshape((1,) * (signal.ndim - 1) + (-1,)), mode='same', axes=-1)
 
 
 def get_distance_azimuth(lat1, long1, lat2, long2):
@@ -139,9 +198,24 @@ def estimate_phase_velocity(set_1, set_2):
     return 1 / (k + 1E-10), azm
 
 
+@lru_cache(maxsize=None)
+def get_apf_kernel(p, nu=3):
+    alpha1 = 0.54
+    alpha2 = 0.46
+    # cn = 1 / np.sqrt(alpha1 * alpha1 + alpha2 * alpha2 / 2)
+    cn1 = 1 / alpha1
+    win_length = nu * p + 1
+    window = windows.hamming(win_length)
+    x = np.arange(win_length)
+    base_func = np.exp(2j * np.pi * x / p)
+    kernel = cn1 * (2 / (win_length - 1)) * window * base_func
+    kernel.flags.writeable = False
+    return kernel
+
+
 def apf(signal, period, time=None, dt=1, nu=3):
-    result = []
-    s_length = len(signal)
+    signal = np.asarray(signal)
+    s_length = signal.shape[-1]
     min_period, max_period, period_step = period
     if min_period < 2:
         min_period = 2
@@ -149,29 +223,66 @@ def apf(signal, period, time=None, dt=1, nu=3):
         min_time, max_time, time_step = (0, s_length - 1, 1)
     else:
         min_time, max_time, time_step = time
-    alpha1 = 0.54
-    alpha2 = 0.46
-    # cn = 1 / np.sqrt(alpha1 * alpha1 + alpha2 * alpha2 / 2)
-    cn1 = 1 / alpha1
-    for p in range(min_period, max_period + 1, period_step):
-        win_length = nu * p + 1
-        window = windows.hamming(win_length)
-        x = np.array(range(win_length))
-        base_func = np.exp(2j * np.pi * x / p)
-        spectrum = []
-        for t in range(min_time, max_time + 1, time_step):
-            left_ind, right_ind = define_indexes(t, signal, win_length)
-            y = signal[left_ind: right_ind]
-            if len(y) < win_length:
-                y_add = np.zeros(win_length - len(y))
-                if left_ind == 0:
-                    y = np.hstack([y_add, y])
-                else:
-                    y = np.hstack([y, y_add])
-            current = cn1 * (2 / (win_length - 1)) * np.sum(y * window * base_func)
-            spectrum.append(current)
-        result.append(spectrum)
-    return np.array(result).transpose()
+    times = np.arange(min_time, max_time + 1, time_step)
+    periods = range(min_period, max_period + 1, period_step)
+    kernel_shape = (1,) * (signal.ndim - 1) + (-1,)
+    result = np.empty(signal.shape[:-1] + (len(times), len(periods)), dtype=np.complex128)
+    for num, p in enumerate(periods):
+        kernel = get_apf_kernel(p, nu)
+        win_length = len(kernel)
+        left_half = win_length // 2
+        right_half = win_length - left_half
+        spectrum = fftconvolve(signal, kernel[::-1].reshape(kernel_shape), mode='full', axes=-1)
+        result[..., num] = spectrum[..., times + win_length - 1 - left_half]
+        # windows cut on both sides are zero-padded at the front only (see define_indexes)
+        both_cut = (times <= left_half) & (times + right_half > s_length)
+        if np.any(both_cut):
+            front_cut = np.sum(signal * kernel[win_length - s_length:], axis=-1)
+            result[..., both_cut, num] = front_cut[..., np.newaxis]
+    return result
+
+
+def find_half_max_extent(spectr, max_indexes):
+    n_time = spectr.shape[0]
+    columns, column_index = np.unique(max_indexes, return_inverse=True)
+    values = spectr[:, columns]
+    rows = np.arange(n_time)
+    half_values = values[rows, column_index] / 2
+    # sparse table of running minima: min_table[k][i] = min(values[i:i + 2 ** k])
+    min_table = [values]
+    while 2 ** len(min_table) <= n_time:
+        step = 2 ** (len(min_table) - 1)
+        min_table.append(np.minimum(min_table[-1][:-step], min_table[-1][step:]))
+    start = rows.copy()
+    end = rows + 1
+    for k in range(len(min_table) - 1, -1, -1):
+        step = 2 ** k
+        left = start - step
+        valid = left >= 0
+        valid[valid] = min_table[k][left[valid], column_index[valid]] >= half_values[valid]
+        start[valid] = left[valid]
+        valid = end + step <= n_time
+        valid[valid] = min_table[k][end[valid], column_index[valid]] >= half_values[valid]
+        end[valid] += step
+    return np.maximum(start - 1, 0), np.minimum(end, n_time - 1)
+
+
+def estimate_spectral_params(signal, min_period, max_period, time_values, samples_per_min=2):
+    spectrum = apf(signal, period=(samples_per_min * min_period, samples_per_min * max_period - 1, 1))
+    dtec_spectr = np.abs(spectrum)
+    time_values = np.asarray(time_values, dtype=np.float64)
+    rows = np.arange(len(time_values))
+    max_indexes = np.argmax(dtec_spectr, axis=1)
+    period_values = min_period + max_indexes / samples_per_min
+    start_indexes, end_indexes = find_half_max_extent(dtec_spectr, max_indexes)
+    params = dict()
+    params['ampl'] = dtec_spectr[rows, max_indexes]
+    params['angle'] = np.angle(spectrum[rows, max_indexes])
+    params['period'] = period_values
+    params['start_time'] = time_values[start_indexes]
+    params['end_time'] = time_values[end_indexes]
+    params['duration'] = 60 * (params['end_time'] - params['start_time']) / period_values
+    return params
 
 
 def arg_loc_max(x):
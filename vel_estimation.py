@@ -5,7 +5,7 @@ from scipy.signal import correlate, correlation_lags
 
 from utils.geo.geo_coords import GeoCoord
 from utils.analysis import estimate_phase_velocity, get_distance_azimuth
-from corr_filter import load_parse_data
+from corr_filter import load_time_coord_data
 
 if __name__ == '__main__':
     year = 2017
@@ -28,35 +28,26 @@ if __name__ == '__main__':
     resol_lon = GeoCoord(0, 45)
     time_start = datetime.datetime(year, month, day, hour_start, min_start)
     time_end = datetime.datetime(year, month, day, hour_end, min_end)
-    time_format = '%Y.%m.%d %H:%M:%S'
     lat_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/lat/1/{c_lat.degs}d{c_lat.mins}m_{resol_lat.degs}d{resol_lat.mins}m_lat_av.txt"
     lon_file_name = f"C:/Users/Sergii/Dell_D/Coding/Python/PyCharm/GNSS_Analysis/results/out/EU/{year}/{year}-{month_str}-{day_str}/7200/Lon/1/{c_lon.degs}d{c_lon.mins}m_{resol_lon.degs}d{resol_lon.mins}m_lon_av.txt"
-    res_lat = load_parse_data(lat_file_name, time_format)
-    res_lon = load_parse_data(lon_file_name, time_format)
-    coords_lat = sorted(list(set(res_lat[1])))
-    coords_lon = sorted(list(set(res_lon[1])))
+    lat_times, coords_lat, lat_dtec = load_time_coord_data(lat_file_name)
+    lon_times, coords_lon, lon_dtec = load_time_coord_data(lon_file_name)
+    coords_lat = coords_lat.tolist()
+    coords_lon = coords_lon.tolist()
     diff_coord_lat = [abs(cur_lon - c_lon_float) for cur_lon in coords_lat]
     diff_coord_lon = [abs(cur_lat - c_lat_float) for cur_lat in coords_lon]
     cur_lon_index = diff_coord_lat.index(min(diff_coord_lat))
     cur_lat_index = diff_coord_lon.index(min(diff_coord_lon))
-    lon_dTEC_first = []
-    lon_dTEC_second = []
-    for i in range(len(res_lat[0])):
-        if time_start <= res_lat[0][i] <= time_end:
-            if res_lat[1][i] == coords_lat[cur_lon_index - lon_num]:
-                lon_dTEC_first.append(res_lat[2][i])
-            if res_lat[1][i] == coords_lat[cur_lon_index + lon_num]:
-                lon_dTEC_second.append(res_lat[2][i])
-    time_dTEC = []
-    lat_dTEC_first = []
-    lat_dTEC_second = []
-    for i in range(len(res_lon[0])):
-        if time_start <= res_lon[0][i] <= time_end:
-            if res_lon[1][i] == coords_lon[cur_lat_index - lat_num]:
-                lat_dTEC_first.append(res_lon[2][i])
-                time_dTEC.append(res_lon[0][i])
-            if res_lon[1][i] == coords_lon[cur_lat_index + lat_num]:
-                lat_dTEC_second.append(res_lon[2][i])
+    lat_time_mask = (lat_times >= np.datetime64(time_start)) & (lat_times <= np.datetime64(time_end))
+    lon_time_mask = (lon_times >= np.datetime64(time_start)) & (lon_times <= np.datetime64(time_end))
+    lon_dTEC_first = lat_dtec[lat_time_mask, cur_lon_index - lon_num]
+    lon_dTEC_second = lat_dtec[lat_time_mask, cur_lon_index + lon_num]
+    lat_dTEC_first = lon_dtec[lon_time_mask, cur_lat_index - lat_num]
+    lat_dTEC_second = lon_dtec[lon_time_mask, cur_lat_index + lat_num]
+    lon_dTEC_first = lon_dTEC_first[~np.isnan(lon_dTEC_first)]
+    lon_dTEC_second = lon_dTEC_second[~np.isnan(lon_dTEC_second)]
+    lat_dTEC_first = lat_dTEC_first[~np.isnan(lat_dTEC_first)]
+    lat_dTEC_second = lat_dTEC_second[~np.isnan(lat_dTEC_second)]
     lat_corr = correlate(lat_dTEC_first, lat_dTEC_second)
     lat_corr /= np.max(lat_corr)
     lat_lags = correlation_lags(np.array(lat_dTEC_first).size, np.array(lat_dTEC_second).size, mode="full")